@@ -17,6 +17,8 @@ def process_args(get_videoresolution: callable, get_imagesize: callable):
             description=description, epilog=projectsite)
     parser.add_argument('-v', '--verbose', action='store_true',
                         help='show the ffmpeg commands as they are run')
+    parser.add_argument('--audio-once', action='store_true',
+                        help='encode audio once for all parts (or copy it if suitable)')
     parser.add_argument('--cssfile', type=str, metavar='path/mycss.css',
                         help='CSS file to be copied to outputdir')
     parser.add_argument('--cssurl', type=str, metavar='http://.../mycss.css or mycss.css',
@@ -24,6 +26,8 @@ def process_args(get_videoresolution: callable, get_imagesize: callable):
     parser.add_argument('--format', type=str,
                         choices=["mp4q4", "mp4q3", "mp4q2", "mp4q1", "webm"], default="mp4q3",
                         help='default file type & quality: mp4q3')
+    parser.add_argument('--html-only', action='store_true',
+                        help='only regenerate index.html from an earlier run\'s outputdir')
     parser.add_argument('--out', type=str, dest="outputdir", metavar="outputdir",
                         help='directory to which output files will be written')
     parser.add_argument('--split-at', type=str, metavar='ll:splitlogo.png',
@@ -44,11 +48,15 @@ def process_args(get_videoresolution: callable, get_imagesize: callable):
     if args.verbose:
         base.verbose = True
     #----- manually check for further problems:
-    if not os.path.exists(args.inputfile):
+    if not os.path.exists(args.inputfile) and not args.html_only:
         parser.error(f"file {args.inputfile} must be readable")
     if args.cssfile and not os.path.exists(args.cssfile):
         parser.error(f"file {args.cssfile} must be readable")
     # we do not check that args.outputdir is a writable directory or nonexisting
+    if args.html_only:  # need neither video nor logos
+        handle_out(parser, args)
+        handle_toc(parser, args)
+        return args
     #----- retrieve video resolution:
     args.vidwidth, args.vidheight = get_videoresolution(args.inputfile)
     print(f"Video resolution: {args.vidwidth}x{args.vidheight}")
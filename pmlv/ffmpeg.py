@@ -19,6 +19,8 @@ import pmlv.base as base
 
 ffmpeg_cmd = "static_ffmpeg"
 ffprobe_cmd = "static_ffprobe"
+BLOCKSIZE = 1 << 16  # bytes per read() from binary ffx_popen pipes
+ACCEPTABLE_AUDIO_BITRATE_FACTOR = 1.5  # source audio may be this much above target
 
 @attrs.define
 class Encoding:
@@ -32,22 +34,22 @@ class Encoding:
     suffix: str  # filename suffix
     flags_v: str  # ffmpeg video codec settings
     flags_a: str  # ffmpeg audio codec settings
-
+    flags_mux: str = ""  # ffmpeg output container settings
 
 
 _encodings = dict(
     mp4q4 = Encoding("mp4", 
             "-c:v libx264 -crf 22 -preset medium -tune stillimage", 
-            "-c:a aac -b:a 64k -movflags +faststart"),
+            "-c:a aac -b:a 64k", "-movflags +faststart"),
     mp4q3 = Encoding("mp4", 
             "-c:v libx264 -crf 26 -preset medium -tune stillimage", 
-            "-c:a aac -b:a 56k -movflags +faststart"),
+            "-c:a aac -b:a 56k", "-movflags +faststart"),
     mp4q2 = Encoding("mp4", 
             "-c:v libx264 -crf 30 -preset medium -tune stillimage", 
-            "-c:a aac -b:a 48k -movflags +faststart"),
+            "-c:a aac -b:a 48k", "-movflags +faststart"),
     mp4q1 = Encoding("mp4", 
             "-c:v libx264 -crf 34 -preset medium -tune stillimage", 
-            "-c:a aac -b:a 40k -movflags +faststart"),
+            "-c:a aac -b:a 40k", "-movflags +faststart"),
     webm = Encoding("webm",
             "-c:v libvpx -b:v 200k -quality good -speed 3",
             "-c:a libopus -b:a 32k -cutoff 8000"),
@@ -63,6 +65,20 @@ def get_encoding(name: str, flags_v: str = None, flags_a: str = None):
     return enc
 
 
+def get_audioinfo(file: str) -> tg.Tuple[str, int]:
+    """
+    Return (codec_name, bit_rate) of the first audio stream,
+    ('', 0) if there is none and bit_rate 0 if it is unknown.
+    """
+    opts = "-v error -select_streams a:0 -show_entries stream=codec_name,bit_rate -of csv=nk=0:p=0"
+    output = ffx_getoutput(f"{ffprobe_cmd} -i {file} {opts}")
+    mm = re.search(r"codec_name=(\w+)", output)
+    codec = mm.group(1) if mm else ''
+    mm = re.search(r"bit_rate=(\d+)", output)
+    bitrate = int(mm.group(1)) if mm else 0
+    return (codec, bitrate)
+
+
 def make_pgm_logo(logofile: str, outputdir: str) -> str:
     pgmfile = f"{outputdir}/logo.pgm"
     cmd = f"{ffmpeg_cmd} -y -i {logofile} {pgmfile}"
@@ -107,6 +123,98 @@ def get_videoduration_secs(file: str) -> float:
     return float(output)
 
 
+# find_rect output reduced to its separators: frame lines become ',' (no match)
+# or ',,,' (match: frame,time,xcoord,ycoord).
+_all_but_separators = bytes(c for c in range(256) if c not in b",\n")
+_newmatch_separators = b"\n,\n,,,"  # a frame without match, then one with
+
+
+def newmatch_times(file, add_start_and_end=False) -> tg.List[float]:
+    """
+    Returns the times at which stretches of matches start in the
+    'frame,time[,xcoord,ycoord]' lines of binary stream file.
+    Prints status every few video seconds.
+    Reads blocks of whatever is available (up to BLOCKSIZE) and finds the
+    starts of stretches with bytes operations on the whole block;
+    only at those starts does it look at individual lines.
+    Between blocks, it keeps only the incomplete last line and
+    whether the last frame matched.
+    """
+    result = [0.0] if add_start_and_end else []
+    previous_quintasec = -1
+    previous_is_match = False
+    last_time = b'0.0'  # timestamp of most recent frame that had one
+    remainder = b""
+    while True:
+        block = file.read1(BLOCKSIZE)  # do not wait for a full block
+        if not block and remainder.strip():  # EOF without final newline
+            block = b"\n"
+        # prefix a stand-in for the previous frame, so stretch starts at
+        # the beginning of the block are found as well:
+        prefix = b"\nframe,,,\n" if previous_is_match else b"\nframe,\n"
+        buf = prefix + remainder + block
+        cut = buf.rfind(b'\n') + 1  # buf[:cut] consists of complete lines
+        separators = buf.translate(None, _all_but_separators)
+        separators_cut = separators.rfind(b'\n') + 1
+        lineno, linestart = 0, 0  # linestart: offset of line number lineno
+        pos = separators.find(_newmatch_separators, 0, separators_cut)
+        while pos >= 0:  # found the start of a stretch of matches
+            previous_lineno = lineno
+            lineno = separators.count(b'\n', 0, pos + 3)  # up to match line
+            linestart = _newline_offset(buf, lineno - previous_lineno, linestart) + 1
+            time = buf[linestart:buf.index(b'\n', linestart)].split(b',')[1]
+            if not time:  # use time of previous frame
+                previous_linestart = buf.rfind(b'\n', 0, linestart - 1) + 1
+                time = buf[previous_linestart:linestart].split(b',')[1].strip()
+            result.append(round(float(time or last_time), 2))
+            pos = separators.find(_newmatch_separators, pos + 1, separators_cut)
+        lastline = buf[buf.rfind(b'\n', 0, cut-1) + 1:cut-1]
+        previous_is_match = lastline.count(b',') > 1
+        time = lastline.split(b',')[1].strip()
+        if time:
+            last_time = time
+        remainder = buf[cut:]
+        quintasec = math.floor(float(last_time)/5.0)
+        if quintasec > previous_quintasec:
+            previous_quintasec = quintasec
+            print("%d secs processed, logo matched %dx" %
+                  (5*quintasec, len(result) - add_start_and_end), end='\r')
+        if not block:  # EOF
+            break
+    end = float(last_time)
+    if add_start_and_end:
+        if end - result[-1] > 2.0:
+            result.append(end)
+        else:  # avoid super-short final videos, which are probably a user mistake
+            result[-1] = end  # overwrite near-the-end-split with end
+    print("")  # leave progress line
+    return result
+
+
+def _newline_offset(buf: bytes, n: int, start: int) -> int:
+    """
+    Offset of the n-th newline in buf[start:].
+    Gallops, then bisects, so that it scans only about as far as that newline.
+    """
+    lo, count_lo = start, 0  # buf[start:lo] has count_lo < n newlines
+    step = 32 * n  # frame lines are usually shorter than 32 bytes
+    while True:
+        hi = min(lo + step, len(buf))
+        count = buf.count(b'\n', lo, hi)
+        if count_lo + count >= n or hi == len(buf):
+            break
+        lo, count_lo = hi, count_lo + count
+        step *= 2
+    while hi - lo > 1:  # buf[start:hi] has at least n newlines
+        mid = (lo + hi) // 2
+        count = buf.count(b'\n', lo, mid)
+        if count_lo + count < n:
+            lo, count_lo = mid, count_lo + count
+        else:
+            hi = mid
+    return hi - 1
+
+
 def find_rect(logopgmfile: str, region: dict, inputfile: str,
               add_start_and_end=False) -> tg.List[float]:
     """
@@ -116,58 +224,80 @@ def find_rect(logopgmfile: str, region: dict, inputfile: str,
     For find_rect params, see https://trac.ffmpeg.org/ticket/8766.
     Returns the timestamp (in seconds) of the first frame of each stretch of such frames.
     """
-    def newmatch_times(file, region: dict) -> tg.List[float]:
-        """
-        Returns the times at which stretches of matches start.
-        Prints status every few video seconds.
-        """
-        result = [0.0] if add_start_and_end else []
-        previous_quintasec = -1
-        previous_is_match = False
-        f = ['frame', '0.0']
-        for line in file:
-            # print(line)
-            f = line.split(',')
-            assert f[0] == "frame"
-            quintasec = math.floor(float(f[1])/5.0) if f[1] else previous_quintasec
-            if quintasec > previous_quintasec:
-                previous_quintasec = quintasec
-                print("%d secs processed, logo matched %dx" %
-                      (5*quintasec, len(result) - add_start_and_end), end='\r')
-            is_match = len(f) > 2  # frame,time,xcoord,ycoord
-            if is_match and not previous_is_match:  # start of new match
-                # print("\n", line[:-1])
-                result.append(round(float(f[1]), 2))
-            previous_is_match = is_match
-        end = float(f[1])
-        if add_start_and_end:
-            if end - result[-1] > 2.0:
-                result.append(end)
-            else:  # avoid super-short final videos, which are probably a user mistake
-                result[-1] = end  # overwrite near-the-end-split with end
-        print("")  # leave progress line
-        return result
     find_rect_filter = f"find_rect={logopgmfile}:threshold=0.2"
     r = region  # abbrev
     rectangle = f"xmin={r['xmin']}:xmax={r['xmax']}:ymin={r['ymin']}:ymax={r['ymax']}"
     show_spec = "frame=pts_time:frame_tags=lavfi.rect.x,lavfi.rect.y"
     cmd = (f"{ffprobe_cmd} -f lavfi movie=%s,%s:%s -show_entries %s -of csv" %
            (inputfile, find_rect_filter, rectangle, show_spec))
-    p = ffx_popen(cmd)
-    result = newmatch_times(p.stdout, region)
+    p = ffx_popen(cmd, binary=True)
+    result = newmatch_times(p.stdout, add_start_and_end)
     p.wait()  # wait for process to finish
     return result
 
 
+def audio_is_copyable(codec: str, bitrate: int, encoding: Encoding) -> bool:
+    """
+    Whether source audio with codec (as named by ffprobe) and bitrate
+    can be used as is instead of being encoded with encoding.flags_a.
+    """
+    mm_codec = re.search(r"-c:a (?:lib)?(\S+)", encoding.flags_a)  # libopus is opus
+    mm_bitrate = re.search(r"-b:a (\d+)k", encoding.flags_a)
+    target_codec = mm_codec.group(1) if mm_codec else ''
+    target_bitrate = 1000 * int(mm_bitrate.group(1)) if mm_bitrate else 0
+    return (codec == target_codec and 0 < bitrate and
+            bitrate <= ACCEPTABLE_AUDIO_BITRATE_FACTOR * target_bitrate)
+
+
+def encode_audio(inputfile: str, encoding: Encoding,
+                 outputdir: str) -> tg.Optional[str]:
+    """
+    Produce the audio track for all parts in one go, for use by encode_in_parts.
+    Source audio that already has the target codec at no more than
+    ACCEPTABLE_AUDIO_BITRATE_FACTOR times the target bitrate is copied as is.
+    Returns the audio filename or None if inputfile has no audio.
+    """
+    codec, bitrate = get_audioinfo(inputfile)
+    if not codec:
+        return None
+    audiofile = f"{outputdir}/audio.mka"  # Matroska holds both AAC and Opus
+    if audio_is_copyable(codec, bitrate, encoding):
+        print(f"Copying {codec} audio track ({bitrate//1000}k)")
+        flags_a = "-c:a copy"
+    else:
+        print(f"Encoding {codec} audio track")
+        flags_a = encoding.flags_a
+    # write the very stream that get_audioinfo probed:
+    ffx_run(f"{ffmpeg_cmd} -y -i {inputfile} -map 0:a:0 -vn -sn -dn "
+            f"{flags_a} {audiofile}")
+    return audiofile
+
+
 def encode_in_parts(inputfile: str, encoding: Encoding,
-                    outputdir: str, splittimes: tg.List[float]):
+                    outputdir: str, splittimes: tg.List[float],
+                    audiofile: tg.Optional[str] = None):
+    """
+    Encode v1, v2, ... from the stretches between splittimes.
+    If audiofile is given (see encode_audio), only the video is encoded
+    and the audio is cut from audiofile by stream copy.
+    """
     n = len(splittimes) - 1  # start does not count
     print("Encoding %d video part%s" % (n, "s" if n != 1 else ""))
     for i in range(1, n+1):  # i in 1..n for building v{i}.*
         from_to = f"-ss %.2f -to %.2f" % (splittimes[i-1], splittimes[i])
         outputfile = f"{outputdir}/v{i}.{encoding.suffix}"
-        cmd = (f"{ffmpeg_cmd} -y {from_to} -i {inputfile} "
-               f"{encoding.flags_v} {encoding.flags_a} {outputfile}")
+        if audiofile:
+            # audiofile keeps the audio's offset from the start of inputfile
+            # in its timestamps, so seek it by timestamp, not by position:
+            inputs = (f"{from_to} -i {inputfile} "
+                      f"-seek_timestamp 1 {from_to} -i {audiofile} "
+                      f"-map 0:v:0 -map 1:a:0")
+            flags_a = "-c:a copy"
+        else:
+            inputs = f"{from_to} -i {inputfile}"
+            flags_a = encoding.flags_a
+        cmd = (f"{ffmpeg_cmd} -y {inputs} "
+               f"{encoding.flags_v} {flags_a} {encoding.flags_mux} {outputfile}")
         # os.system(cmd)
         p = ffx_popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
         remainder = ""
@@ -208,13 +338,17 @@ def ffx_getoutput(cmd: str) -> str:
     return output
 
 
-def ffx_popen(cmd: str, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
-             ) -> subprocess.Popen:
+def ffx_popen(cmd: str, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+              binary=False) -> subprocess.Popen:
     """
     Popen ffmpeg cmd with stdout and stderr as given; at most one of them a pipe.
     Caller must read the pipe to the end and then call p.wait().
+    binary=True gives a block-buffered bytes pipe instead of line-buffered text.
     """
     base.trace(cmd)
+    if binary:
+        return subprocess.Popen(cmd,
+            bufsize=BLOCKSIZE, stdout=stdout, stderr=stderr, shell=True)
     LINEBUFFERED = 1
     return subprocess.Popen(cmd,
         bufsize=LINEBUFFERED, stdout=stdout, stderr=stderr,
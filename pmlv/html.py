@@ -5,6 +5,7 @@ import shutil
 import typing as tg
 
 from pmlv.base import Stoptimes
+from pmlv.sidecar import sidecar_filename
 
 
 def default_css_srcfile():
@@ -70,6 +71,7 @@ script_template = """
       var pmlv_video = document.getElementById("pomalevi-video")
       var pmlv_video_idx = 1
       var pmlv_stoptimes = %(stoptimes)s  // list of list of floats: stop times in seconds
+      // (replaced by the stops from the sidecar, if that can be fetched)
 
       function pmlv_pause_at_stoptimes() {
           for (var t of pmlv_stoptimes[pmlv_video_idx-1]) {
@@ -98,8 +100,16 @@ script_template = """
         }
       }
 
+      function pmlv_load_sidecar() {
+        fetch("%(sidecar)s")
+          .then(response => response.json())
+          .then(sidecar => { pmlv_stoptimes = sidecar.parts.map(part => part.stops) })
+          .catch(error => {})  // e.g. on file: URLs; keep the stoptimes above
+      }
+
       pmlv_video.addEventListener("timeupdate", pmlv_pause_at_stoptimes)
       pmlv_switch_to(1, false)
+      pmlv_load_sidecar()
 
     </script>
 """
@@ -138,7 +148,8 @@ def generate_html(title: str,
     css_block = f'    <link rel="stylesheet" href="{css_href}">'
     #----- prepare TOC:
     toc_rows = ""
-    script = script_template % dict(stoptimes=stoptimes, suffix=suffix)
+    script = script_template % dict(stoptimes=stoptimes, suffix=suffix,
+                                    sidecar=sidecar_filename)
     for i in range(1, len(stoptimes)+1):
         as_link = f"onclick='pmlv_switch_to({i})'"
         num_cell = f"{i}"
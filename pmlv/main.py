@@ -3,13 +3,21 @@ import os
 from pathlib import Path
 
 from pmlv.args import process_args
+from pmlv.base import Stoptimes
 import pmlv.ffmpeg as ffmpeg
 from pmlv.html import read_toc, generate_html
 from pmlv.ppt import wait_for_powerpoint
+from pmlv.sidecar import read_sidecar, write_sidecar
 
 
 def doitall():
     args = process_args(ffmpeg.get_videoresolution, ffmpeg.get_imagesize)
+    if args.html_only:
+        sidecar = read_sidecar(args.outputdir)
+        stoptimes = [part['stops'] for part in sidecar['parts']]
+        make_html(args, stoptimes, sidecar['encoding']['suffix'])
+        print("DONE.")
+        return
     wait_for_powerpoint(args.inputfile)
     if not Path(args.outputdir).exists():
         os.mkdir(args.outputdir, mode=0o755)
@@ -24,8 +32,14 @@ def doitall():
     else:
         splittimes = [0.0, ffmpeg.get_videoduration_secs(args.inputfile)]
     print("split times: ", splittimes)
+    if args.audio_once:
+        audiofile = ffmpeg.encode_audio(args.inputfile, encoding, args.outputdir)
+    else:
+        audiofile = None
     ffmpeg.encode_in_parts(args.inputfile, encoding, 
-                           args.outputdir, splittimes)
+                           args.outputdir, splittimes, audiofile)
+    if audiofile:
+        os.remove(audiofile)
     numvideos = len(splittimes) - 1
     if args.stoplogo:
         print("Searching for stops in %d video%s: --stop-at"%
@@ -38,14 +52,20 @@ def doitall():
         os.remove(stoplogofile)
     else:
         stoptimes = [[] for _ in range(numvideos)]
+    write_sidecar(args.outputdir, args.format, encoding, splittimes, stoptimes)
+    make_html(args, stoptimes, encoding.suffix)
+    print("DONE.")
+
+
+def make_html(args, stoptimes: Stoptimes, suffix: str):
+    numvideos = len(stoptimes)
     if args.toc:
         title, toc_entries = read_toc(args.toc, numvideos)
     else:
         basename = os.path.splitext(os.path.basename(args.inputfile))[0]
         title, toc_entries = (basename, [f"part {i+1}" for i in range(numvideos)])
-    generate_html(title, args.cssfile, args.cssurl, stoptimes, encoding.suffix,
+    generate_html(title, args.cssfile, args.cssurl, stoptimes, suffix,
                   toc_entries, args.outputdir)
-    print("DONE.")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,59 @@
+"""Knows about the pomalevi.json sidecar file describing the parts of a build."""
+import hashlib
+import json
+import sys
+import typing as tg
+
+import attrs
+
+import pmlv.base as base
+
+if tg.TYPE_CHECKING:
+    from pmlv.ffmpeg import Encoding  # only for the annotation; html needs no ffmpeg
+
+sidecar_filename = "pomalevi.json"
+sidecar_version = 1
+
+
+def write_sidecar(outputdir: str, formatname: str, encoding: "Encoding",
+                  splittimes: tg.List[float], stoptimes: base.Stoptimes):
+    """Describe the parts v1, v2, ... in outputdir/pomalevi.json."""
+    filename = f"{outputdir}/{sidecar_filename}"
+    print(f"Generating {filename}")
+    parts = []
+    for i in range(1, len(splittimes)):  # i in 1..n for describing v{i}.*
+        videofile = f"v{i}.{encoding.suffix}"
+        start, end = splittimes[i-1], splittimes[i]
+        parts.append(dict(file=videofile, start=start, end=end,
+                          duration=round(end - start, 2),
+                          stops=stoptimes[i-1],
+                          sha256=filehash(f"{outputdir}/{videofile}")))
+    sidecar = dict(version=sidecar_version,
+                   splittimes=splittimes,
+                   encoding=dict(format=formatname, **attrs.asdict(encoding)),
+                   parts=parts)
+    with open(filename, 'wt', encoding='utf8') as f:
+        json.dump(sidecar, f, indent=2)
+
+
+def read_sidecar(outputdir: str) -> dict:
+    filename = f"{outputdir}/{sidecar_filename}"
+    try:
+        with open(filename, 'rt', encoding='utf8') as f:
+            sidecar = json.load(f)
+    except (OSError, ValueError) as exc:
+        print(f"Cannot read {filename}: {exc}")
+        sys.exit(1)
+    if sidecar.get('version') != sidecar_version:
+        print(f"{filename} has version {sidecar.get('version')}, "
+              f"but pomalevi needs version {sidecar_version}. Re-encode!")
+        sys.exit(1)
+    return sidecar
+
+
+def filehash(filename: str) -> str:
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
@@ -0,0 +1,60 @@
+import io
+import time
+import typing as tg
+
+import pmlv.ffmpeg as ffmpeg
+
+
+def frames(n: int, matching: tg.Callable, newline=b"\n") -> bytes:
+    """ffprobe-like find_rect output of n frames at 25 fps."""
+    return b"".join(b"frame,%.6f%s%s" % (i/25, b",12,34" if matching(i) else b"", newline)
+                    for i in range(n))
+
+
+def newmatch_times(output: bytes, bufsize: int, add_start_and_end=False):
+    stream = io.BufferedReader(io.BytesIO(output), bufsize)
+    return ffmpeg.newmatch_times(stream, add_start_and_end)
+
+
+def test_newmatch_times():
+    def matching(i):
+        return 100 <= i < 150 or 300 <= i < 320 or 990 <= i
+    for newline in (b"\n", b"\r\n"):
+        output = frames(1000, matching, newline)
+        for bufsize in (7, 37, 1000, 1 << 16):  # lines split across blocks
+            assert newmatch_times(output, bufsize) == [4.0, 12.0, 39.6]
+            assert newmatch_times(output, bufsize, add_start_and_end=True) == \
+                   [0.0, 4.0, 12.0, 39.96]  # 39.6 is too close to the end
+    #----- match right at the start, no final newline:
+    output = frames(500, lambda i: i < 10 or 200 <= i < 210).rstrip(b"\n")
+    for bufsize in (7, 37, 1 << 16):
+        assert newmatch_times(output, bufsize, add_start_and_end=True) == \
+               [0.0, 0.0, 8.0, 19.96]
+    #----- frames without time:
+    output = b"frame,1.0\nframe,\nframe,1.08,12,34\nframe,,12,34\nframe,1.16\nframe,\n"
+    assert newmatch_times(output, 5) == [1.08]
+    output = b"frame,1.0\nframe,,12,34\nframe,1.08\n"
+    assert newmatch_times(output, 5) == [1.0]  # time of previous frame
+
+
+def test_newmatch_times_speed():
+    n = 200_000
+    output = frames(n, lambda i: i % 1000 < 100)
+    start = time.perf_counter()
+    result = newmatch_times(output, ffmpeg.BLOCKSIZE)
+    secs = time.perf_counter() - start
+    print(f"newmatch_times: {1e9*secs/n:.0f} ns per frame")
+    assert len(result) == n // 1000
+    assert secs/n < 5e-6  # generous, to stay robust on slow machines
+
+
+def test_audio_is_copyable():
+    mp4q3 = ffmpeg.get_encoding("mp4q3")  # aac 56k
+    assert ffmpeg.audio_is_copyable("aac", 48000, mp4q3)
+    assert ffmpeg.audio_is_copyable("aac", 84000, mp4q3)
+    assert not ffmpeg.audio_is_copyable("aac", 84001, mp4q3)
+    assert not ffmpeg.audio_is_copyable("aac", 0, mp4q3)  # unknown bitrate
+    assert not ffmpeg.audio_is_copyable("wmav2", 48000, mp4q3)
+    webm = ffmpeg.get_encoding("webm")  # libopus 32k
+    assert ffmpeg.audio_is_copyable("opus", 32000, webm)
+    assert not ffmpeg.audio_is_copyable("aac", 32000, webm)
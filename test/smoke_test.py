@@ -1,11 +1,27 @@
+import hashlib
+import json
 import os
 import re
 import shutil
+import subprocess
 import tempfile
 import time
 
 import pytest
 
+
+def assert_av_in_sync(videofile: str):
+    """videofile must have one video and one audio stream that start and end together."""
+    cmd = (f"static_ffprobe -v error -show_entries stream=codec_type,start_time,duration "
+           f"-of json {videofile}")
+    streams = json.loads(subprocess.getoutput(cmd))['streams']
+    assert sorted(s['codec_type'] for s in streams) == ['audio', 'video']
+    video, audio = sorted(streams, key=lambda s: s['codec_type'], reverse=True)
+    print(f"{videofile}: video {video}, audio {audio}")
+    assert abs(float(audio['start_time']) - float(video['start_time'])) < 0.1
+    assert abs(float(audio['duration']) - float(video['duration'])) < 0.1
+
+
 def test_encode():
     with tempfile.TemporaryDirectory() as mypath:
         mydir = os.path.basename(mypath)
@@ -58,5 +74,65 @@ def test_encode():
         v2_size = os.stat(f"{mydir}/mini/v2.mp4").st_size
         assert 125000 < v1_size < 145000
         assert 70000 < v2_size < 90000
-        #----- patch toc:  will become a TODO
-        #----- check new toc:  will become a TODO
+        #----- run pomalevi again with --audio-once:
+        cmd = f"python {pomdir}/pmlv/main.py --audio-once --out {mydir}/mini-ao {mydir}/mini.wmv"
+        os.system(cmd)
+        assert os.path.exists(f"{mydir}/mini-ao/v1.mp4")
+        assert os.path.exists(f"{mydir}/mini-ao/v2.mp4")
+        assert not os.path.exists(f"{mydir}/mini-ao/v3.mp4")
+        assert not os.path.exists(f"{mydir}/mini-ao/audio.mka")
+        v1_size = os.stat(f"{mydir}/mini-ao/v1.mp4").st_size
+        v2_size = os.stat(f"{mydir}/mini-ao/v2.mp4").st_size
+        assert 125000 < v1_size < 145000
+        assert 70000 < v2_size < 90000
+        assert_av_in_sync(f"{mydir}/mini-ao/v1.mp4")
+        assert_av_in_sync(f"{mydir}/mini-ao/v2.mp4")
+        #----- --audio-once with AAC input audio, which gets copied:
+        cmd = (f"static_ffmpeg -y -i {mydir}/mini.wmv -c:v libx264 -crf 18 "
+               f"-c:a aac -b:a 48k {mydir}/mini-aac.mp4")
+        subprocess.run(cmd, shell=True, capture_output=True, check=True)
+        cmd = f"python {pomdir}/pmlv/main.py --audio-once {mydir}/mini-aac.mp4"
+        output = subprocess.run(cmd, shell=True, capture_output=True, text=True).stdout
+        assert "Copying aac audio track" in output
+        assert os.path.exists(f"{mydir}/mini-aac/v1.mp4")
+        assert os.path.exists(f"{mydir}/mini-aac/v2.mp4")
+        assert not os.path.exists(f"{mydir}/mini-aac/v3.mp4")
+        assert_av_in_sync(f"{mydir}/mini-aac/v1.mp4")
+        assert_av_in_sync(f"{mydir}/mini-aac/v2.mp4")
+        #----- check sidecar:
+        with open(f"{mydir}/mini/pomalevi.json", 'rt', encoding='utf8') as f:
+            sidecar = json.load(f)
+        assert sidecar['version'] == 1
+        assert len(sidecar['parts']) == 2
+        assert [part['stops'] for part in sidecar['parts']] == [[3.53], []]
+        with open(f"{mydir}/mini/v1.mp4", 'rb') as f:
+            v1_sha256 = hashlib.sha256(f.read()).hexdigest()
+        assert sidecar['parts'][0]['sha256'] == v1_sha256
+        #----- patch toc:
+        v1_mtime = os.stat(f"{mydir}/mini/v1.mp4").st_mtime_ns
+        v2_mtime = os.stat(f"{mydir}/mini/v2.mp4").st_mtime_ns
+        cmd = (f"python {pomdir}/pmlv/main.py --html-only "
+               f"--toc {mydir}/mini-othertoc.txt {mydir}/mini.wmv")
+        os.system(cmd)
+        #----- check new toc:
+        with open(f"{mydir}/mini/index.html", 'rt') as f:
+            html = f.read()
+            print("matching '%s'" % toc2_title)
+            assert html.find(f"<title>{toc2_title}</title>") > 0
+            print("matching '%s'" % toc2_p1)
+            assert html.find(f"<td>{toc2_p1}</td>") > 0
+            print("matching '%s'" % toc2_p2)
+            assert html.find(f"<td>{toc2_p2}</td>") > 0
+            assert html.find("pmlv_stoptimes = [[3.53], []]") > 0  # from sidecar
+            assert html.find('"v" + i + ".mp4"') > 0  # suffix from sidecar
+        assert os.stat(f"{mydir}/mini/v1.mp4").st_mtime_ns == v1_mtime
+        assert os.stat(f"{mydir}/mini/v2.mp4").st_mtime_ns == v2_mtime
+        #----- patch toc without the input video:
+        os.rename(f"{mydir}/mini.wmv", f"{mydir}/mini-away.wmv")
+        cmd = f"python {pomdir}/pmlv/main.py --html-only {mydir}/mini.wmv"
+        os.system(cmd)
+        os.rename(f"{mydir}/mini-away.wmv", f"{mydir}/mini.wmv")
+        with open(f"{mydir}/mini/index.html", 'rt') as f:
+            html = f.read()
+            assert html.find(f"<title>{toc1_title}</title>") > 0  # default toc again
+            assert html.find("pmlv_stoptimes = [[3.53], []]") > 0